@@ -24,6 +24,11 @@ except ImportError:
     print("ERROR: openpyxl nicht installiert. Bitte 'pip install openpyxl' ausführen.")
     sys.exit(1)
 
+# Gemeinsame Regex-Schutzschicht liegt in scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'scripts'))
+from regex_guard import MatchGuard, Budget  # noqa: E402
+from pipeline_metrics import PipelineMetrics  # noqa: E402
+
 
 # === CRITERIA EXTRACTION ===
 CRITERIA_KEYWORDS = [
@@ -65,6 +70,16 @@ TAG_PATTERNS = {
     "Allgemein": [],
 }
 
+# Tag-Patterns einmal über den Regex-Guard kompilieren: backtracking-anfällige
+# Muster werden abgelehnt, unbegrenzte Lücken wie `tritt.*gegen` begrenzt.
+GUARD = MatchGuard()
+
+TAG_MATCHERS = {
+    tag: [GUARD.compile(p) for p in patterns]
+    for tag, patterns in TAG_PATTERNS.items()
+    if tag != "Allgemein"
+}
+
 
 def extract_criteria_full(answer: str) -> list[str]:
     """Extrahiert criteriaFull aus der Antwort."""
@@ -114,15 +129,17 @@ def extract_criteria_partial(criteria_full: list[str]) -> list[str]:
     return partial
 
 
-def extract_tags(situation: str, answer: str) -> list[str]:
-    """Extrahiert Tags aus Situation und Antwort."""
-    combined = situation + " " + answer
+def extract_tags(situation: str, answer: str, budget: Budget | None = None) -> list[str]:
+    """Extrahiert Tags aus Situation und Antwort (mit Zeitbudget pro Frage)."""
+    budget = budget or GUARD.start()
+    combined = budget.prepare(situation + " " + answer)
     tags = []
-    for tag, patterns in TAG_PATTERNS.items():
-        if tag == "Allgemein":
-            continue
-        for pattern in patterns:
-            if re.search(pattern, combined):
+    for tag, matchers in TAG_MATCHERS.items():
+        if budget.expired():
+            budget.fallback("tag")
+            return ["Allgemein"]
+        for matcher in matchers:
+            if matcher.search(combined):
                 tags.append(tag)
                 break
     if not tags:
@@ -148,6 +165,23 @@ def source_to_date(source_type: str, ausgabe: str) -> str:
     return f"{year}-{month:02d}-01"
 
 
+# Fehlertyp je validate_row-Meldung (für Metriken)
+VALIDATION_ERROR_TYPES = {
+    "Ungültiger Quellentyp": "quellentyp",
+    "Ungültiges Ausgabenformat": "ausgabe",
+    "Situation fehlt": "situation",
+    "Antwort fehlt": "antwort",
+}
+
+
+def validation_error_type(error: str) -> str:
+    """Ordnet eine Fehlermeldung aus validate_row ihrem Fehlertyp zu."""
+    for fragment, error_type in VALIDATION_ERROR_TYPES.items():
+        if fragment in error:
+            return error_type
+    return "sonstige"
+
+
 def validate_row(row_num: int, quellentyp: str, ausgabe: str, situation: str, answer: str) -> list[str]:
     """Validiert eine Zeile und gibt Fehlerliste zurück."""
     errors = []
@@ -162,13 +196,17 @@ def validate_row(row_num: int, quellentyp: str, ausgabe: str, situation: str, an
     return errors
 
 
-def convert_excel_to_json(excel_path: str, start_index: int = 1) -> tuple[list[dict], list[str]]:
+def convert_excel_to_json(excel_path: str, start_index: int = 1,
+                          metrics: PipelineMetrics | None = None) -> tuple[list[dict], list[str]]:
     """
     Liest die Excel-Datei und konvertiert in JSON-Format.
     Returns: (questions_list, errors_list)
     """
-    wb = openpyxl.load_workbook(excel_path, data_only=True)
-    ws = wb['Regelfragen']
+    metrics = metrics or PipelineMetrics("convert")
+
+    with metrics.stage("load_workbook"):
+        wb = openpyxl.load_workbook(excel_path, data_only=True)
+        ws = wb['Regelfragen']
 
     # Detect header row and column mapping
     headers = {}
@@ -209,61 +247,76 @@ def convert_excel_to_json(excel_path: str, start_index: int = 1) -> tuple[list[d
 
     for row in range(2, ws.max_row + 1):
         # Read values
-        if old_format:
-            quelle_raw = ws.cell(row=row, column=col_quelle).value
-            situation = ws.cell(row=row, column=headers.get('Situation', 3)).value
-            answer = ws.cell(row=row, column=headers.get('Antwort', 4)).value
-            regelref = ws.cell(row=row, column=headers.get('Regelreferenz', 5)).value
-        else:
-            quellentyp = ws.cell(row=row, column=col_map.get('quellentyp')).value
-            ausgabe = ws.cell(row=row, column=col_map.get('ausgabe')).value
-            situation = ws.cell(row=row, column=col_map['situation']).value
-            answer = ws.cell(row=row, column=col_map['antwort']).value
-            regelref = ws.cell(row=row, column=col_map.get('regelreferenz')).value if 'regelreferenz' in col_map else None
+        with metrics.stage("read_row"):
+            if old_format:
+                quelle_raw = ws.cell(row=row, column=col_quelle).value
+                situation = ws.cell(row=row, column=headers.get('Situation', 3)).value
+                answer = ws.cell(row=row, column=headers.get('Antwort', 4)).value
+                regelref = ws.cell(row=row, column=headers.get('Regelreferenz', 5)).value
+            else:
+                quellentyp = ws.cell(row=row, column=col_map.get('quellentyp')).value
+                ausgabe = ws.cell(row=row, column=col_map.get('ausgabe')).value
+                situation = ws.cell(row=row, column=col_map['situation']).value
+                answer = ws.cell(row=row, column=col_map['antwort']).value
+                regelref = ws.cell(row=row, column=col_map.get('regelreferenz')).value if 'regelreferenz' in col_map else None
 
         # Skip empty rows (check Situation as primary indicator)
         if not situation or str(situation).strip() == '':
             continue
 
+        metrics.count("rows_read")
         situation = str(situation).strip()
         answer = str(answer).strip() if answer else ''
 
-        # Parse source
-        if old_format:
-            if not quelle_raw:
-                errors.append(f"Zeile {row}: Quelle fehlt")
-                continue
-            quelle_str = str(quelle_raw).strip()
-            match = re.match(r'^(SR-Zeitung|SR-Newsletter)\s+(\d{2}/\d{4})$', quelle_str)
-            if not match:
-                errors.append(f"Zeile {row}: Ungültiges Quellenformat '{quelle_str}' (erwartet: 'SR-Zeitung MM/YYYY')")
+        with metrics.stage("validate"):
+            # Parse source
+            if old_format:
+                if not quelle_raw:
+                    errors.append(f"Zeile {row}: Quelle fehlt")
+                    metrics.count("rows_rejected", error_type="quelle")
+                    continue
+                quelle_str = str(quelle_raw).strip()
+                match = re.match(r'^(SR-Zeitung|SR-Newsletter)\s+(\d{2}/\d{4})$', quelle_str)
+                if not match:
+                    errors.append(f"Zeile {row}: Ungültiges Quellenformat '{quelle_str}' (erwartet: 'SR-Zeitung MM/YYYY')")
+                    metrics.count("rows_rejected", error_type="quelle")
+                    continue
+                quellentyp = match.group(1)
+                ausgabe = match.group(2)
+            else:
+                quellentyp = str(quellentyp).strip() if quellentyp else ''
+                ausgabe = str(ausgabe).strip() if ausgabe else ''
+
+            # Validate
+            row_errors = validate_row(row, quellentyp, ausgabe, situation, answer)
+            if row_errors:
+                errors.extend(row_errors)
+                for error_type in sorted({validation_error_type(e) for e in row_errors}):
+                    metrics.count("validation_errors", error_type=error_type)
+                metrics.count("rows_rejected", error_type=validation_error_type(row_errors[0]))
                 continue
-            quellentyp = match.group(1)
-            ausgabe = match.group(2)
-        else:
-            quellentyp = str(quellentyp).strip() if quellentyp else ''
-            ausgabe = str(ausgabe).strip() if ausgabe else ''
-
-        # Validate
-        row_errors = validate_row(row, quellentyp, ausgabe, situation, answer)
-        if row_errors:
-            errors.extend(row_errors)
-            continue
 
-        # Build source string
-        source = f"{quellentyp} {ausgabe}"
+            # Build source string
+            source = f"{quellentyp} {ausgabe}"
 
-        # Parse sourceDate
-        try:
-            source_date = source_to_date(quellentyp, ausgabe)
-        except ValueError as e:
-            errors.append(f"Zeile {row}: {e}")
-            continue
+            # Parse sourceDate
+            try:
+                source_date = source_to_date(quellentyp, ausgabe)
+            except ValueError as e:
+                errors.append(f"Zeile {row}: {e}")
+                metrics.count("rows_rejected", error_type="source_date")
+                continue
+
+        metrics.count("rows_validated")
 
         # Extract criteria and tags
-        criteria_full = extract_criteria_full(answer)
-        criteria_partial = extract_criteria_partial(criteria_full)
-        tags = extract_tags(situation, answer)
+        with metrics.stage("extract"):
+            criteria_full = extract_criteria_full(answer)
+            criteria_partial = extract_criteria_partial(criteria_full)
+            budget = GUARD.start()
+            tags = extract_tags(situation, answer, budget)
+            if budget.flags:
+                print(f"WARNUNG: Zeile {row}: Tag-Erkennung abgebrochen ({', '.join(budget.flags)}), bitte prüfen")
 
         # Build explanation (same as answer, with rule reference appended)
         explanation = answer
@@ -284,6 +337,11 @@ def convert_excel_to_json(excel_path: str, start_index: int = 1) -> tuple[list[d
             "tags": tags,
             "explanation": explanation,
         }
+        # Tag-Erkennung abgebrochen: Frage zur Prüfung markieren
+        if budget.flags:
+            question["flags"] = sorted(budget.flags)
+            question["needs_review"] = True
+            metrics.count("questions_flagged")
         questions.append(question)
         idx += 1
 
@@ -295,8 +353,11 @@ def main():
     parser.add_argument('excel_file', help='Pfad zur Excel-Datei')
     parser.add_argument('--output', '-o', help='Ausgabe-JSON-Datei (Standard: questions-manual.json)')
     parser.add_argument('--append-to', help='An bestehende JSON-Datei anhängen')
+    parser.add_argument('--metrics', help='Stufen-Metriken schreiben (.json Timings-Datei oder .prom Prometheus-Text)')
     args = parser.parse_args()
 
+    metrics = PipelineMetrics("convert")
+
     excel_path = Path(args.excel_file)
     if not excel_path.exists():
         print(f"ERROR: Datei nicht gefunden: {excel_path}")
@@ -314,7 +375,7 @@ def main():
             print(f"Bestehende Datei: {len(existing_questions)} Fragen (nächster Index: {start_index})")
 
     # Convert
-    questions, errors = convert_excel_to_json(str(excel_path), start_index)
+    questions, errors = convert_excel_to_json(str(excel_path), start_index, metrics)
 
     # Report errors
     if errors:
@@ -325,6 +386,8 @@ def main():
 
     if not questions:
         print("Keine gültigen Fragen gefunden.")
+        if args.metrics:
+            metrics.write(args.metrics)
         sys.exit(1 if errors else 0)
 
     # Determine output path
@@ -336,8 +399,9 @@ def main():
         all_questions = questions
 
     # Write JSON
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(all_questions, f, ensure_ascii=False, indent=2)
+    with metrics.stage("write_json"):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(all_questions, f, ensure_ascii=False, indent=2)
 
     print(f"✅ {len(questions)} Fragen konvertiert → {output_path}")
     if args.append_to:
@@ -351,6 +415,13 @@ def main():
     for src, count in sorted(sources.items()):
         print(f"  {src}: {count} Fragen")
 
+    print(f"\nRegex-Guard: {GUARD.summary()}")
+
+    if args.metrics:
+        for name, value in GUARD.stats.items():
+            metrics.count(f"regex_guard_{name}", value)
+        print(f"Metriken: {metrics.summary()} → {metrics.write(args.metrics)}")
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Schreibt berechnete Felder (ruleReference, tags, criteriaFull, criteriaPartial)
+aus dem JSON zurück in die Excel-Erfassung.
+
+Die Arbeitsmappe wird zeilenweise gestreamt (openpyxl read-only → write-only),
+der Speicherbedarf hängt also nicht von der Größe der Mappe ab. Die
+abgeleiteten Spalten stehen direkt hinter 'Regelreferenz' (ohne diese Spalte
+am Ende) und werden bei jedem Lauf aufgefrischt.
+
+Zuordnung Zeile → Frage:
+    1. Hash aus Situation + Antwort (Whitespace normalisiert)
+    2. sonst die Spalte 'Index' aus einem früheren Lauf (Text wurde editiert)
+
+Zellen rechts der letzten Überschrift bleiben erhalten und werden hinter
+den übrigen Spalten ausgegeben.
+
+Hinweis: Write-only-Mappen übernehmen nur Werte und Formeln, keine
+Formatierung, Datenüberprüfung oder Kommentare. Deshalb wird standardmäßig
+eine neue Datei geschrieben; --in-place verlangt zusätzlich --force und legt
+vorher eine Sicherungskopie mit Zeitstempel (<name>.bak-JJJJMMTT-HHMMSS.xlsx)
+an; bestehende Sicherungen werden nie überschrieben.
+
+Usage:
+    python write_back_to_excel.py <excel_file> <json_file> [--output <xlsx>] [--in-place --force]
+
+Beispiele:
+    python write_back_to_excel.py ../../SRZ_Regelfragen_Erfassung.xlsx ../questions-all.json
+    python write_back_to_excel.py ../../SRZ_Regelfragen_Erfassung.xlsx ../questions-all.json --in-place --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import openpyxl
+except ImportError:
+    print("ERROR: openpyxl nicht installiert. Bitte 'pip install openpyxl' ausführen.")
+    sys.exit(1)
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'scripts'))
+from pipeline_metrics import PipelineMetrics  # noqa: E402
+
+SHEET_NAME = 'Regelfragen'
+
+# Abgeleitete Spalten: Überschrift → Wert aus der Frage
+DERIVED_COLUMNS = {
+    'Index': lambda q: q['index'],
+    'Regelreferenz (berechnet)': lambda q: q.get('ruleReference', ''),
+    'Tags': lambda q: ', '.join(q.get('tags', [])),
+    'Kriterien voll': lambda q: ', '.join(q.get('criteriaFull', [])),
+    'Kriterien teilweise': lambda q: ', '.join(q.get('criteriaPartial', [])),
+}
+
+
+def row_hash(situation, answer) -> str:
+    """Stabiler Schlüssel für eine Frage, unabhängig von Whitespace."""
+    norm = [' '.join(str(v or '').split()) for v in (situation, answer)]
+    return hashlib.sha1('\x1f'.join(norm).encode('utf-8')).hexdigest()
+
+
+def plan_columns(header: list) -> tuple[list[int], int, dict[str, int]]:
+    """
+    Bestimmt das Spaltenlayout der Ausgabe.
+
+    Returns: (kept, insert_at, source_cols) — Indizes der beibehaltenen
+    Originalspalten, Einfügeposition der abgeleiteten Spalten innerhalb von
+    kept, und die Positionen von Situation/Antwort/Index in der Eingabe.
+    """
+    names = [str(h).strip() if h is not None else '' for h in header]
+    source_cols = {name: names.index(name) for name in ('Situation', 'Antwort', 'Index') if name in names}
+
+    # Alte abgeleitete Spalten fallen weg und werden neu eingefügt
+    kept = [i for i, name in enumerate(names) if name not in DERIVED_COLUMNS]
+    insert_at = len(kept)
+    if 'Regelreferenz' in names:
+        insert_at = kept.index(names.index('Regelreferenz')) + 1
+    return kept, insert_at, source_cols
+
+
+def write_back(excel_path: Path, questions: list[dict], output_path: Path,
+               metrics: PipelineMetrics | None = None) -> dict[str, int]:
+    """Streamt die Mappe nach output_path und füllt die abgeleiteten Spalten."""
+    metrics = metrics or PipelineMetrics("write_back")
+    by_hash = {row_hash(q['situation'], q['correctAnswer']): q for q in questions}
+    by_index = {q['index']: q for q in questions}
+    stats = {'hash': 0, 'index': 0, 'unmatched': 0}
+
+    src = openpyxl.load_workbook(excel_path, read_only=True, data_only=False)
+    if SHEET_NAME not in src.sheetnames:
+        src.close()
+        raise ValueError(f"Tabellenblatt '{SHEET_NAME}' fehlt in {excel_path}")
+    dst = openpyxl.Workbook(write_only=True)
+
+    try:
+        for sheet_name in src.sheetnames:
+            ws_in = src[sheet_name]
+            # Gespeicherte Dimension ignorieren: Mappen aus dem Write-only-Modus
+            # haben keine, sonst würden Zellen außerhalb abgeschnitten
+            ws_in.reset_dimensions()
+            ws_out = dst.create_sheet(sheet_name)
+            rows = ws_in.iter_rows(values_only=True)
+
+            if sheet_name != SHEET_NAME:
+                # Andere Blätter unverändert (nur Werte) übernehmen
+                for values in rows:
+                    ws_out.append(list(values))
+                continue
+
+            header = list(next(rows, ()))
+            kept, insert_at, cols = plan_columns(header)
+            derived_names = list(DERIVED_COLUMNS)
+            out_header = [header[i] for i in kept]
+            ws_out.append(out_header[:insert_at] + derived_names + out_header[insert_at:])
+
+            for values in rows:
+                with metrics.stage("write_row"):
+                    values = list(values)
+                    # Zellen ohne Überschrift werden unverändert hinten angehängt
+                    extra = values[len(header):]
+                    values = values[:len(header)] + [None] * (len(header) - len(values))
+                    out = [values[i] for i in kept]
+                    derived = [None] * len(derived_names)
+
+                    situation = values[cols['Situation']] if 'Situation' in cols else None
+                    if situation is not None and str(situation).strip():
+                        answer = values[cols['Antwort']] if 'Antwort' in cols else None
+                        q = by_hash.get(row_hash(situation, answer))
+                        matched_by = 'hash'
+                        if q is None and 'Index' in cols:
+                            try:
+                                q = by_index.get(int(values[cols['Index']]))
+                                matched_by = 'index'
+                            except (TypeError, ValueError):
+                                q = None
+                        if q is None:
+                            matched_by = 'unmatched'
+                        else:
+                            derived = [fn(q) for fn in DERIVED_COLUMNS.values()]
+                        stats[matched_by] += 1
+                        metrics.count("rows_written", matched_by=matched_by)
+
+                    ws_out.append(out[:insert_at] + derived + out[insert_at:] + extra)
+
+        with metrics.stage("save"):
+            dst.save(output_path)
+    finally:
+        src.close()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Schreibt berechnete Felder aus dem JSON in die Excel-Erfassung zurück')
+    parser.add_argument('excel_file', help='Pfad zur Excel-Datei')
+    parser.add_argument('json_file', help='JSON mit berechneten Feldern (z.B. questions-all.json)')
+    parser.add_argument('--output', '-o', help='Ausgabe-Datei (Standard: <excel_file>-angereichert.xlsx)')
+    parser.add_argument('--in-place', action='store_true', help='Excel-Datei ersetzen (Formatierung geht verloren, nur mit --force)')
+    parser.add_argument('--force', action='store_true', help='--in-place bestätigen; vorher wird <name>.bak-<Zeitstempel>.xlsx angelegt')
+    parser.add_argument('--metrics', help='Stufen-Metriken schreiben (.json Timings-Datei oder .prom Prometheus-Text)')
+    args = parser.parse_args()
+
+    excel_path = Path(args.excel_file)
+    if not excel_path.exists():
+        print(f"ERROR: Datei nicht gefunden: {excel_path}")
+        sys.exit(1)
+
+    if args.in_place and not args.force:
+        print("ERROR: --in-place verwirft Formatierung, Datenüberprüfung und Kommentare der Mappe.")
+        print("       Mit --force bestätigen (legt vorher eine Sicherungskopie an) oder --output verwenden.")
+        sys.exit(1)
+
+    with open(args.json_file, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+
+    if args.in_place:
+        fd, tmp_name = tempfile.mkstemp(suffix='.xlsx', dir=excel_path.parent)
+        os.close(fd)
+        output_path = Path(tmp_name)
+    else:
+        output_path = Path(args.output) if args.output else excel_path.with_name(f"{excel_path.stem}-angereichert.xlsx")
+
+    metrics = PipelineMetrics("write_back")
+    try:
+        stats = write_back(excel_path, questions, output_path, metrics)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        if args.in_place:
+            output_path.unlink(missing_ok=True)
+        sys.exit(1)
+
+    if args.in_place:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        backup_path = excel_path.with_name(f"{excel_path.stem}.bak-{stamp}.xlsx")
+        if backup_path.exists():
+            output_path.unlink(missing_ok=True)
+            print(f"ERROR: Sicherungskopie existiert bereits: {backup_path}")
+            sys.exit(1)
+        shutil.copy2(excel_path, backup_path)
+        print(f"Sicherungskopie: {backup_path}")
+        output_path.replace(excel_path)
+        output_path = excel_path
+
+    print(f"✅ Abgeleitete Spalten geschrieben → {output_path}")
+    print(f"   Zugeordnet per Hash: {stats['hash']}, per Index: {stats['index']}, ohne Treffer: {stats['unmatched']}")
+    if stats['index']:
+        print("   Hinweis: Per Index zugeordnete Zeilen wurden seit dem letzten Export editiert, bitte neu konvertieren.")
+
+    if args.metrics:
+        print(f"Metriken: {metrics.summary()} → {metrics.write(args.metrics)}")
+
+
+if __name__ == '__main__':
+    main()
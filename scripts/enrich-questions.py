@@ -7,10 +7,14 @@ Enrich questions-preview.json with:
 - explanation (reasoning extracted from correctAnswer + rule context)
 """
 
+import argparse
 import json
 import re
 from datetime import datetime
 
+from pipeline_metrics import PipelineMetrics
+from regex_guard import MatchGuard, Budget
+
 # ============================================================
 # 1. Source date mapping
 # ============================================================
@@ -319,24 +323,50 @@ TAG_KEYWORDS = {
     ],
 }
 
+# Compile the keyword tables once through the regex guard: backtracking-prone
+# patterns are rejected here.
+GUARD = MatchGuard()
+
+RULE_MATCHERS = [
+    (GUARD.compile(pattern, re.IGNORECASE), rule_num, weight)
+    for pattern, rule_num, weight in RULE_KEYWORDS
+]
+
+TAG_MATCHERS = {
+    tag: [GUARD.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for tag, patterns in TAG_KEYWORDS.items()
+}
+
 
 def get_source_date(source: str) -> str | None:
     return SOURCE_DATES.get(source)
 
 
-def get_rule_references(situation: str, answer: str) -> str:
+def get_rule_references(situation: str, answer: str, budget: Budget | None = None) -> str:
     """Determine the most relevant rule reference(s) from text analysis."""
-    combined = situation + " " + answer
+    budget = budget or GUARD.start()
+    combined = budget.prepare(situation + " " + answer)
     scores: dict[int, int] = {}
 
-    for pattern, rule_num, weight in RULE_KEYWORDS:
-        matches = re.findall(pattern, combined, re.IGNORECASE)
-        if matches:
-            scores[rule_num] = scores.get(rule_num, 0) + weight * len(matches)
+    for matcher, rule_num, weight in RULE_MATCHERS:
+        if budget.expired():
+            budget.fallback("rule")
+            return "Regel 12"
+        count = sum(1 for _ in matcher.finditer(combined))
+        if count:
+            scores[rule_num] = scores.get(rule_num, 0) + weight * count
 
     if not scores:
         return "Regel 12"  # Default fallback: most common rule in SR questions
 
+    return format_rule_references(rank_rules(scores))
+
+
+def rank_rules(scores: dict[int, int]) -> list[int]:
+    """Rank rules by keyword score: primary first, then close secondaries."""
+    if not scores:
+        return [12]
+
     # Sort by score descending
     sorted_rules = sorted(scores.items(), key=lambda x: -x[1])
 
@@ -350,24 +380,26 @@ def get_rule_references(situation: str, answer: str) -> str:
             break
 
     # Limit to 3 rules max
-    refs = refs[:3]
+    return [rule_num for rule_num, _ in refs[:3]]
 
-    # Format as "Regel X (Name), Regel Y (Name)"
-    parts = []
-    for rule_num, _ in refs:
-        parts.append(f"Regel {rule_num} ({RULE_NAMES[rule_num]})")
 
-    return ", ".join(parts)
+def format_rule_references(rules: list[int]) -> str:
+    """Format as "Regel X (Name), Regel Y (Name)"."""
+    return ", ".join(f"Regel {rule_num} ({RULE_NAMES[rule_num]})" for rule_num in rules)
 
 
-def get_tags(situation: str, answer: str) -> list[str]:
+def get_tags(situation: str, answer: str, budget: Budget | None = None) -> list[str]:
     """Assign topic tags based on keyword analysis."""
-    combined = situation + " " + answer
+    budget = budget or GUARD.start()
+    combined = budget.prepare(situation + " " + answer)
     tags = []
 
-    for tag, patterns in TAG_KEYWORDS.items():
-        for pattern in patterns:
-            if re.search(pattern, combined, re.IGNORECASE):
+    for tag, matchers in TAG_MATCHERS.items():
+        if budget.expired():
+            budget.fallback("tag")
+            return ["Allgemein"]
+        for matcher in matchers:
+            if matcher.search(combined):
                 tags.append(tag)
                 break
 
@@ -378,8 +410,13 @@ def get_tags(situation: str, answer: str) -> list[str]:
     return sorted(set(tags))
 
 
-def get_explanation(situation: str, answer: str, rule_ref: str) -> str:
-    """Generate a concise explanation referencing the relevant rule."""
+def get_explanation(situation: str, answer: str, rule_ref: str, regelheft=None) -> str:
+    """
+    Generate a concise explanation referencing the relevant rule.
+
+    With a Regelheft index (regelheft_index.RegelheftIndex), the reference is
+    extended by the best-matching section of the primary rule.
+    """
     # The correctAnswer already contains the full explanation.
     # The explanation field adds rule context.
     # Extract the reasoning part (after the direct answer).
@@ -390,20 +427,51 @@ def get_explanation(situation: str, answer: str, rule_ref: str) -> str:
 
     sentences = re.split(r'(?<=[.!?])\s+', answer)
 
+    section = None
+    primary = re.match(r"Regel (\d+)", rule_ref)
+    if regelheft is not None and primary:
+        # Only the primary rule: a secondary rule's passage is often generic
+        section = regelheft.best_section(int(primary.group(1)), situation + " " + answer)
+
     if len(sentences) <= 1:
         # Short answer, use rule reference as explanation
+        if section:
+            return f"Siehe {format_section(section)}."
         return f"Siehe {rule_ref}."
 
     # The reasoning is everything after the first sentence
     reasoning = " ".join(sentences[1:])
 
     # Add rule reference prefix
+    if section:
+        return f"{reasoning} (Vgl. {format_section(section)})"
     return f"{reasoning} (Vgl. {rule_ref.split(',')[0]})"
 
 
+def format_section(section) -> str:
+    """Format as 'Regel X, Abschnitt N „Titel“: „Auszug“'."""
+    ref = f"Regel {section.rule}"
+    if section.subsection:
+        ref += f", Abschnitt {section.subsection} „{section.title}“"
+    return f"{ref}: „{section.excerpt}“"
+
+
 def main():
-    with open("data/questions-preview.json", "r", encoding="utf-8") as f:
-        questions = json.load(f)
+    parser = argparse.ArgumentParser(description="Enrich questions with rule references, tags and explanations")
+    parser.add_argument("--metrics", help="Write stage metrics (.json timings file or .prom Prometheus text)")
+    parser.add_argument("--regelheft-index", help="Regelheft section index (scripts/regelheft_index.py build) for explanation excerpts")
+    args = parser.parse_args()
+
+    metrics = PipelineMetrics("enrich")
+    regelheft = None
+    if args.regelheft_index:
+        # Imported only when needed (pulls in similarity_index and its synonyms)
+        from regelheft_index import RegelheftIndex
+        regelheft = RegelheftIndex(args.regelheft_index)
+
+    with metrics.stage("load"):
+        with open("data/questions-preview.json", "r", encoding="utf-8") as f:
+            questions = json.load(f)
 
     enriched_count = 0
 
@@ -413,28 +481,46 @@ def main():
         source = q.get("source", "")
 
         # sourceDate
-        sd = get_source_date(source)
-        if sd:
-            q["sourceDate"] = sd
+        with metrics.stage("source_date"):
+            sd = get_source_date(source)
+            if sd:
+                q["sourceDate"] = sd
+
+        # One matching budget per question for rules and tags
+        budget = GUARD.start()
 
         # ruleReference
-        rule_ref = get_rule_references(situation, answer)
-        q["ruleReference"] = rule_ref
+        with metrics.stage("rule_reference"):
+            rule_ref = get_rule_references(situation, answer, budget)
+            q["ruleReference"] = rule_ref
 
         # tags
-        tags = get_tags(situation, answer)
-        q["tags"] = tags
+        with metrics.stage("tags"):
+            tags = get_tags(situation, answer, budget)
+            q["tags"] = tags
+
+        # Flag questions where matching was cut short
+        if budget.flags:
+            q["flags"] = sorted(set(q.get("flags", [])) | set(budget.flags))
+            q["needs_review"] = True
+            metrics.count("questions_flagged")
 
         # explanation
-        explanation = get_explanation(situation, answer, rule_ref)
-        q["explanation"] = explanation
+        with metrics.stage("explanation"):
+            explanation = get_explanation(situation, answer, rule_ref, regelheft)
+            q["explanation"] = explanation
 
         enriched_count += 1
+        metrics.count("questions_enriched")
+
+    if regelheft is not None:
+        regelheft.close()
 
     # Save
-    output = json.dumps(questions, ensure_ascii=False, indent=2)
-    with open("data/questions-preview.json", "w", encoding="utf-8") as f:
-        f.write(output + "\n")
+    with metrics.stage("save"):
+        output = json.dumps(questions, ensure_ascii=False, indent=2)
+        with open("data/questions-preview.json", "w", encoding="utf-8") as f:
+            f.write(output + "\n")
 
     # Stats
     print(f"Enriched {enriched_count} questions.")
@@ -461,6 +547,9 @@ def main():
     for tag, count in sorted(tag_counts.items(), key=lambda x: -x[1]):
         print(f"  {tag}: {count}")
 
+    # Regex guard counters
+    print(f"\nRegex guard: {GUARD.summary()}")
+
     # Show a few examples
     print("\nExamples:")
     for q in questions[:3]:
@@ -474,6 +563,11 @@ def main():
     json.loads(output)
     print("\nJSON valid!")
 
+    if args.metrics:
+        for name, value in GUARD.stats.items():
+            metrics.count(f"regex_guard_{name}", value)
+        print(f"Metrics: {metrics.summary()} → {metrics.write(args.metrics)}")
+
 
 if __name__ == "__main__":
     main()
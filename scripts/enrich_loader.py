@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Load enrich-questions.py as a module.
+
+The hyphenated file name cannot be imported directly. session_sampling.py,
+regelheft_index.py and ruleset_diff.py all load it through load_enrich(),
+so the keyword tables and helpers behave the same everywhere.
+
+Usage:
+    enrich = load_enrich()
+    enrich.RULE_NAMES
+    old = load_enrich("ruleset_old", source=git_show_output, origin="HEAD:scripts/enrich-questions.py")
+"""
+
+import types
+from pathlib import Path
+
+ENRICH_PATH = Path(__file__).resolve().parent / "enrich-questions.py"
+
+
+def load_enrich(name: str = "enrich_questions", source: str | None = None,
+                origin: str | None = None) -> types.ModuleType:
+    """
+    Execute enrich-questions.py as a fresh module.
+
+    source replaces the file contents (e.g. an older revision); origin is
+    the file name shown in tracebacks and as module.__file__.
+    """
+    origin = origin or str(ENRICH_PATH)
+    if source is None:
+        source = ENRICH_PATH.read_text(encoding="utf-8")
+    module = types.ModuleType(name)
+    module.__file__ = origin
+    exec(compile(source, origin, "exec"), module.__dict__)
+    return module
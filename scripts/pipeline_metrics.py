@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Stage metrics for the question pipeline (convert_excel_to_json.py,
+enrich-questions.py).
+
+Records per stage wall time, CPU time and a latency histogram, labelled
+counters (rows read/validated/rejected, questions enriched, ...) and peak
+RSS. Output is either a JSON timings file (one entry per pipeline, merged
+into an existing file) or Prometheus text format for the node_exporter
+textfile collector (one .prom file per pipeline).
+
+Usage:
+    metrics = PipelineMetrics("enrich")
+    with metrics.stage("load"):
+        ...
+    for q in questions:
+        with metrics.stage("tags"):
+            ...
+        metrics.count("questions_enriched")
+    metrics.write("data/metrics/timings.json")
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRIC_PREFIX = "sr_pipeline"
+
+# Latency histogram buckets in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def peak_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class StageStats:
+    """Accumulated timings of one stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.max_s = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, wall_s: float, cpu_s: float) -> None:
+        self.count += 1
+        self.wall_s += wall_s
+        self.cpu_s += cpu_s
+        self.max_s = max(self.max_s, wall_s)
+        for i, bound in enumerate(BUCKETS):
+            if wall_s <= bound:
+                self.buckets[i] += 1
+                break
+
+    def to_dict(self) -> dict:
+        cumulative = []
+        total = 0
+        for n in self.buckets:
+            total += n
+            cumulative.append(total)
+        return {
+            "count": self.count,
+            "wallSeconds": round(self.wall_s, 6),
+            "cpuSeconds": round(self.cpu_s, 6),
+            "maxSeconds": round(self.max_s, 6),
+            "histogram": {
+                **{str(bound): c for bound, c in zip(BUCKETS, cumulative)},
+                "+Inf": self.count,
+            },
+        }
+
+
+class PipelineMetrics:
+    """Stage timings and counters for one pipeline run."""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.started = datetime.now(timezone.utc)
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self.stages: dict[str, StageStats] = {}
+        self.counters: dict[tuple[str, tuple], int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time one execution of a stage; per-item stages are entered per item."""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.stages.setdefault(name, StageStats())
+            stats.observe(time.perf_counter() - wall, time.process_time() - cpu)
+
+    def count(self, name: str, n: int = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def to_dict(self) -> dict:
+        counters: dict[str, dict | int] = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            if labels:
+                label_key = ",".join(f"{k}={v}" for k, v in labels)
+                counters.setdefault(name, {})[label_key] = value
+            else:
+                counters[name] = value
+        return {
+            "startedAt": self.started.isoformat(timespec="seconds"),
+            "wallSeconds": round(time.perf_counter() - self._start_wall, 6),
+            "cpuSeconds": round(time.process_time() - self._start_cpu, 6),
+            "peakRssBytes": peak_rss_bytes(),
+            "stages": {name: s.to_dict() for name, s in self.stages.items()},
+            "counters": counters,
+        }
+
+    def to_prometheus(self) -> str:
+        p = METRIC_PREFIX
+        base = f'pipeline="{self.pipeline}"'
+        data = self.to_dict()
+        lines = [
+            f"# HELP {p}_wall_seconds Wall time of the whole run.",
+            f"# TYPE {p}_wall_seconds gauge",
+            f"{p}_wall_seconds{{{base}}} {data['wallSeconds']}",
+            f"# HELP {p}_cpu_seconds CPU time of the whole run.",
+            f"# TYPE {p}_cpu_seconds gauge",
+            f"{p}_cpu_seconds{{{base}}} {data['cpuSeconds']}",
+        ]
+        if data["peakRssBytes"] is not None:
+            lines += [
+                f"# HELP {p}_peak_rss_bytes Peak resident set size.",
+                f"# TYPE {p}_peak_rss_bytes gauge",
+                f"{p}_peak_rss_bytes{{{base}}} {data['peakRssBytes']}",
+            ]
+
+        for metric, field, help_text in (
+            ("stage_wall_seconds", "wall_s", "Wall time spent per stage."),
+            ("stage_cpu_seconds", "cpu_s", "CPU time spent per stage."),
+        ):
+            lines += [f"# HELP {p}_{metric} {help_text}", f"# TYPE {p}_{metric} gauge"]
+            for name, s in self.stages.items():
+                lines.append(f'{p}_{metric}{{{base},stage="{name}"}} {round(getattr(s, field), 6)}')
+
+        metric = f"{p}_stage_latency_seconds"
+        lines += [f"# HELP {metric} Latency per stage execution.", f"# TYPE {metric} histogram"]
+        for name, s in self.stages.items():
+            labels = f'{base},stage="{name}"'
+            for bound, c in s.to_dict()["histogram"].items():
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {c}')
+            lines.append(f"{metric}_sum{{{labels}}} {round(s.wall_s, 6)}")
+            lines.append(f"{metric}_count{{{labels}}} {s.count}")
+
+        seen: set[str] = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{p}_{name}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines += [f"# TYPE {metric} counter"]
+            extra = "".join(f',{k}="{v}"' for k, v in labels)
+            lines.append(f"{metric}{{{base}{extra}}} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str | Path) -> Path:
+        """Write .prom as Prometheus text, anything else as merged JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".prom":
+            content = self.to_prometheus()
+        else:
+            existing = {}
+            if path.exists():
+                with open(path, "r", encoding="utf-8") as f:
+                    existing = json.load(f)
+            existing.setdefault("pipelines", {})[self.pipeline] = self.to_dict()
+            content = json.dumps(existing, ensure_ascii=False, indent=2) + "\n"
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(content, encoding="utf-8")
+        tmp.replace(path)
+        return path
+
+    def summary(self) -> str:
+        parts = [f"{name} {s.wall_s:.3f}s" for name, s in self.stages.items()]
+        rss = peak_rss_bytes()
+        if rss is not None:
+            parts.append(f"peak RSS {rss / 1024 / 1024:.1f} MB")
+        return ", ".join(parts)
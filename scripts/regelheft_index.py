@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Precompiled section index of the DFB Regelheft 2025/2026 for explanations.
+
+Build step: parses a local copy of the Regelheft (.txt, or .pdf via
+pdftotext -layout) into passages keyed by rule number (RULE_NAMES in
+enrich-questions.py), sub-section and paragraph, and writes a compact,
+memory-mappable index with keyword postings.
+
+Lookup: passages are sorted by rule, so a rule's passages are one id range
+(O(1) via rule_offs). Query terms are found by binary search in the term
+table and each posting list is cut to the rule's range by binary search, so
+scoring never touches the rulebook text. Only the winning passage's text is
+read back as the excerpt.
+
+Tokenization and the mmap reader are shared with similarity_index.py.
+
+File layout (little-endian, sections 4-byte aligned, read via mmap):
+    header      magic, n_passages, n_terms, n_postings
+    rule_offs   uint32[MAX_RULE + 2]     passage range per rule number
+    sub_nums    uint32[n_passages]       sub-section number (0 = intro)
+    title_offs  uint32[n_passages + 1]   offsets into title_blob
+    title_blob  utf-8 sub-section titles
+    text_offs   uint32[n_passages + 1]   offsets into text_blob
+    text_blob   utf-8 passage text
+    term_offs   uint32[n_terms + 1]      offsets into term_blob
+    term_blob   utf-8 terms, sorted bytewise
+    idf         float32[n_terms]
+    post_offs   uint32[n_terms + 1]
+    post_docs   uint32[n_postings]       passage id (ascending per term)
+    post_wts    float32[n_postings]      normalised tf-idf weight
+
+Usage:
+    python scripts/regelheft_index.py build ~/Dokumente/Regelheft-2025-2026.pdf
+    python scripts/regelheft_index.py lookup 12 "Torwart nimmt Rückpass mit der Hand auf"
+    python scripts/enrich-questions.py --regelheft-index data/regelheft-index.bin
+"""
+
+import argparse
+import bisect
+import math
+import re
+import struct
+import subprocess
+import sys
+from array import array
+from pathlib import Path
+from typing import NamedTuple
+
+from enrich_loader import load_enrich
+from similarity_index import MappedIndex, le_bytes, tf_weights, tokenize
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_OUTPUT = ROOT / "data" / "regelheft-index.bin"
+
+MAGIC = b"SRRGH001"
+HEADER = struct.Struct("<8sIII")
+
+MAX_RULE = 17
+
+# Passages longer than this are split at sentence boundaries
+MAX_PASSAGE_CHARS = 800
+MIN_PASSAGE_CHARS = 40
+EXCERPT_CHARS = 280
+# Below this cosine score a passage shares little more than a common word
+MIN_SCORE = 0.1
+
+RULE_HEADING_RE = re.compile(r"^\s*Regel\s+(\d{1,2})\b[\s.:–-]*(.*)$")
+SUB_HEADING_RE = re.compile(r"^\s*(\d{1,2})\.\s+([A-ZÄÖÜ][^.!?:,]{2,60})$")
+MAX_HEADING_WORDS = 6
+TOC_LINE_RE = re.compile(r"(\.{3,}|\s{3,})\s*\d+\s*$")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+class Section(NamedTuple):
+    rule: int
+    subsection: int
+    title: str
+    excerpt: str
+    score: float
+
+
+def read_regelheft(path: Path) -> str:
+    """Plain text of the Regelheft; PDFs are converted with pdftotext -layout."""
+    if path.suffix.lower() != ".pdf":
+        return path.read_text(encoding="utf-8")
+    try:
+        return subprocess.run(
+            ["pdftotext", "-layout", str(path), "-"],
+            capture_output=True, text=True, check=True,
+        ).stdout
+    except FileNotFoundError:
+        raise SystemExit("ERROR: pdftotext not found (poppler-utils), or pass a .txt export")
+
+
+def _split_long(text: str) -> list[str]:
+    if len(text) <= MAX_PASSAGE_CHARS:
+        return [text]
+    parts, current = [], ""
+    for sentence in SENTENCE_RE.split(text):
+        if current and len(current) + len(sentence) + 1 > MAX_PASSAGE_CHARS:
+            parts.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        parts.append(current)
+    return parts
+
+
+def parse_passages(text: str, rule_names: dict[int, str]) -> list[tuple[int, int, str, str]]:
+    """
+    Split the Regelheft into (rule, subsection, title, text) passages.
+
+    A rule heading is "Regel N ..." whose rest is empty or starts with the
+    rule's name; table-of-contents lines (dot leaders, page numbers) are
+    skipped. Sub-sections are short numbered headings like "3. Disziplinarmaßnahmen".
+    """
+    passages = []
+    rule, sub, title = 0, 0, ""
+    paragraph: list[str] = []
+
+    def flush():
+        if rule and paragraph:
+            joined = ""
+            for line in paragraph:
+                # Undo hyphenation at line breaks ("Spiel-\nfeld")
+                if joined.endswith("-") and line[:1].islower():
+                    joined = joined[:-1] + line
+                else:
+                    joined = f"{joined} {line}".strip()
+            if len(joined) >= MIN_PASSAGE_CHARS:
+                for part in _split_long(joined):
+                    passages.append((rule, sub, title, part))
+        paragraph.clear()
+
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            flush()
+            continue
+        if TOC_LINE_RE.search(raw):
+            continue
+
+        m = RULE_HEADING_RE.match(line)
+        if m and int(m.group(1)) in rule_names:
+            number, rest = int(m.group(1)), m.group(2)
+            if not rest or rest.lower().startswith(rule_names[number].lower()):
+                if number != rule:
+                    flush()
+                    rule, sub, title = number, 0, rule_names[number]
+                # Repeated running headers of the current rule are dropped
+                continue
+
+        m = SUB_HEADING_RE.match(line)
+        if m and rule and len(m.group(2).split()) <= MAX_HEADING_WORDS:
+            flush()
+            sub, title = int(m.group(1)), m.group(2).strip()
+            continue
+
+        paragraph.append(line)
+
+    flush()
+    return passages
+
+
+def _blob(strings: list[str]) -> tuple[array, bytes]:
+    offs = array("I", [0])
+    blob = bytearray()
+    for s in strings:
+        blob += s.encode("utf-8")
+        offs.append(len(blob))
+    blob += b"\0" * (-len(blob) % 4)
+    return offs, bytes(blob)
+
+
+def build_index(passages: list[tuple[int, int, str, str]], output_path: Path) -> dict:
+    """Write the section index; returns basic stats."""
+    # Stable sort keeps document order within a rule
+    passages = sorted(passages, key=lambda p: p[0])
+
+    rules = [p[0] for p in passages]
+    rule_offs = array("I", (bisect.bisect_left(rules, r) for r in range(MAX_RULE + 2)))
+
+    vectors = [tf_weights(tokenize(f"{title} {text}")) for _, _, title, text in passages]
+    df: dict[str, int] = {}
+    for vec in vectors:
+        for t in vec:
+            df[t] = df.get(t, 0) + 1
+
+    n = len(passages)
+    terms = sorted(df, key=lambda t: t.encode("utf-8"))
+    term_id = {t: i for i, t in enumerate(terms)}
+    idf = [math.log((1 + n) / (1 + df[t])) + 1.0 for t in terms]
+
+    postings: list[list[tuple[int, float]]] = [[] for _ in terms]
+    for pid, vec in enumerate(vectors):
+        weighted = {term_id[t]: w * idf[term_id[t]] for t, w in vec.items()}
+        norm = math.sqrt(sum(w * w for w in weighted.values())) or 1.0
+        for tid, w in weighted.items():
+            postings[tid].append((pid, w / norm))
+
+    post_offs, post_docs, post_wts = array("I", [0]), array("I"), array("f")
+    for plist in postings:
+        for pid, w in plist:
+            post_docs.append(pid)
+            post_wts.append(w)
+        post_offs.append(len(post_docs))
+
+    title_offs, title_blob = _blob([p[2] for p in passages])
+    text_offs, text_blob = _blob([p[3] for p in passages])
+    term_offs, term_blob = _blob(terms)
+
+    sections = [
+        rule_offs,
+        array("I", (p[1] for p in passages)),
+        title_offs, title_blob,
+        text_offs, text_blob,
+        term_offs, term_blob,
+        array("f", idf),
+        post_offs, post_docs, post_wts,
+    ]
+    with open(output_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, n, len(terms), len(post_docs)))
+        for section in sections:
+            f.write(section if isinstance(section, bytes) else le_bytes(section))
+
+    return {"passages": n, "rules": len({p[0] for p in passages}), "terms": len(terms),
+            "bytes": output_path.stat().st_size}
+
+
+def _excerpt(text: str) -> str:
+    if len(text) <= EXCERPT_CHARS:
+        return text
+    cut = ""
+    for sentence in SENTENCE_RE.split(text):
+        if len(cut) + len(sentence) + 1 > EXCERPT_CHARS:
+            break
+        cut = f"{cut} {sentence}".strip()
+    return cut or text[:EXCERPT_CHARS].rsplit(" ", 1)[0] + " …"
+
+
+class RegelheftIndex(MappedIndex):
+    """Read-only, memory-mapped view of an index built by build_index()."""
+
+    def __init__(self, path: Path = DEFAULT_OUTPUT):
+        super().__init__(path, MAGIC, HEADER, "Regelheft index")
+        n, n_terms, n_postings = self.header
+        self.n_passages, self.n_terms = n, n_terms
+
+        self.rule_offs = self._take(MAX_RULE + 2, "I")
+        self.sub_nums = self._take(n, "I")
+        self.title_offs = self._take(n + 1, "I")
+        self.title_blob = self._take_blob(self.title_offs)
+        self.text_offs = self._take(n + 1, "I")
+        self.text_blob = self._take_blob(self.text_offs)
+        self.term_offs = self._take(n_terms + 1, "I")
+        self.term_blob = self._take_blob(self.term_offs)
+        self.idf = self._take(n_terms, "f")
+        self.post_offs = self._take(n_terms + 1, "I")
+        self.post_docs = self._take(n_postings, "I")
+        self.post_wts = self._take(n_postings, "f")
+
+    @staticmethod
+    def _string(offs, blob, i: int) -> str:
+        return bytes(blob[offs[i]:offs[i + 1]]).decode("utf-8")
+
+    def best_section(self, rule: int, text: str) -> Section | None:
+        """Best-matching passage of one rule for the given question text."""
+        if not 0 < rule <= MAX_RULE:
+            return None
+        first, last = self.rule_offs[rule], self.rule_offs[rule + 1]
+        if first == last:
+            return None
+
+        vector = {}
+        for term, w in tf_weights(tokenize(text)).items():
+            tid = self.term_id(term)
+            if tid is not None:
+                vector[tid] = w * self.idf[tid]
+        # Normalised query, so scores are cosines and MIN_SCORE is comparable
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+
+        scores: dict[int, float] = {}
+        for tid, w in vector.items():
+            qw = w / norm
+            start, end = self.post_offs[tid], self.post_offs[tid + 1]
+            lo = bisect.bisect_left(self.post_docs, first, start, end)
+            hi = bisect.bisect_left(self.post_docs, last, lo, end)
+            for p in range(lo, hi):
+                pid = self.post_docs[p]
+                scores[pid] = scores.get(pid, 0.0) + qw * self.post_wts[p]
+
+        if not scores:
+            return None
+        pid, score = max(scores.items(), key=lambda item: item[1])
+        if score < MIN_SCORE:
+            return None
+        return Section(
+            rule=rule,
+            subsection=self.sub_nums[pid],
+            title=self._string(self.title_offs, self.title_blob, pid),
+            excerpt=_excerpt(self._string(self.text_offs, self.text_blob, pid)),
+            score=round(score, 4),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the Regelheft section index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Parse a local Regelheft copy into the index")
+    p_build.add_argument("regelheft", help="Regelheft as .pdf or .txt")
+    p_build.add_argument("--output", default=str(DEFAULT_OUTPUT))
+
+    p_lookup = sub.add_parser("lookup", help="Best section of a rule for a text")
+    p_lookup.add_argument("rule", type=int)
+    p_lookup.add_argument("text")
+    p_lookup.add_argument("--index", default=str(DEFAULT_OUTPUT))
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        rule_names = load_enrich().RULE_NAMES
+        passages = parse_passages(read_regelheft(Path(args.regelheft)), rule_names)
+        if not passages:
+            print("ERROR: no rule sections found (expected headings like 'Regel 12 – Fouls ...')")
+            sys.exit(1)
+        stats = build_index(passages, Path(args.output))
+        print(f"Indexed {stats['passages']} passages from {stats['rules']} rules → {args.output}")
+        print(f"  Terms: {stats['terms']}, Size: {stats['bytes'] / 1024:.1f} KB")
+        missing = sorted(set(rule_names) - {p[0] for p in passages})
+        if missing:
+            print(f"  WARNING: no sections for Regel {', '.join(map(str, missing))}")
+        return
+
+    with RegelheftIndex(Path(args.index)) as index:
+        section = index.best_section(args.rule, args.text)
+    if section is None:
+        print("No matching section.")
+        return
+    print(f"Regel {section.rule}, Abschnitt {section.subsection} „{section.title}“ (score {section.score})")
+    print(f"  {section.excerpt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Guard layer for the keyword regex tables (RULE_KEYWORDS, TAG_KEYWORDS in
+enrich-questions.py, TAG_PATTERNS in convert_excel_to_json.py).
+
+- Static analysis when the tables load: repeated groups that can backtrack
+  exponentially (nested quantifiers `(a+)+`, alternations `(a|aa)+`,
+  empty-matchable bodies `(a?)+`) are rejected with UnsafePatternError.
+  Single wildcard gaps between literals (`[Ss]chiedsrichter.*entscheid`) are
+  at most polynomial and are left as they are; the text length is capped by
+  max_chars.
+- Per-question time budget: matching stops once the budget is spent and the
+  caller falls back to its default rule/tag; the question gets flagged.
+- Counters for rejections, truncations and fallbacks (MatchGuard.stats).
+"""
+
+import re
+import time
+from collections import Counter
+
+# Per-question budget for all keyword matching (seconds). A normal question
+# needs well under a millisecond.
+DEFAULT_BUDGET_S = 0.25
+
+# Texts longer than this are cut before matching and the question is flagged.
+# Regular questions are < 2.000 characters; anything above is a pasted blob.
+DEFAULT_MAX_CHARS = 20_000
+
+FLAG_BUDGET_EXCEEDED = "regex_budget_exceeded"
+FLAG_TEXT_TRUNCATED = "text_truncated"
+
+
+class UnsafePatternError(ValueError):
+    """Raised when a table pattern is prone to catastrophic backtracking."""
+
+
+def _quantifier_at(pattern: str, i: int) -> tuple[str, str, int] | None:
+    """Return (quantifier, lazy_suffix, end) if a quantifier starts at pattern[i]."""
+    if i >= len(pattern):
+        return None
+    ch = pattern[i]
+    if ch in "*+?":
+        end = i + 1
+    elif ch == "{":
+        m = re.match(r"\{\d*,?\d*\}", pattern[i:])
+        if not m:
+            return None
+        end = i + m.end()
+    else:
+        return None
+    suffix = ""
+    if end < len(pattern) and pattern[end] in "?+":
+        suffix = pattern[end]
+    return pattern[i:end], suffix, end + len(suffix)
+
+
+def _is_repeating(quantifier: str) -> bool:
+    """True for quantifiers that can match the same atom more than once."""
+    if quantifier in ("*", "+"):
+        return True
+    m = re.match(r"\{(\d*)(,?)(\d*)\}", quantifier)
+    if not m:
+        return False
+    low, comma, high = m.groups()
+    if not comma:
+        return int(low or 0) > 1
+    return high == "" or int(high) > 1
+
+
+def _is_optional(quantifier: str) -> bool:
+    """True for quantifiers that also match zero repetitions."""
+    if quantifier in ("*", "?"):
+        return True
+    m = re.match(r"\{(\d*)", quantifier)
+    return bool(m) and int(m.group(1) or 0) == 0
+
+
+class _Group:
+    """What check_pattern() knows about an open group."""
+
+    def __init__(self, lookaround: bool):
+        self.lookaround = lookaround
+        self.repeats = False        # contains a repeating quantifier
+        self.alternation = False    # contains a top-level `|`
+        self.nullable = False       # some finished branch can match ""
+        self.branch_nullable = True  # current branch can match "" so far
+
+    def end_branch(self) -> None:
+        self.nullable = self.nullable or self.branch_nullable
+        self.branch_nullable = True
+
+
+def check_pattern(pattern: str) -> None:
+    """
+    Statically analyse a pattern, raising UnsafePatternError if it is unsafe.
+
+    A repeating quantifier applied to a group is rejected if the group
+    contains a repeating quantifier itself, an alternation (branches may
+    overlap, e.g. `(a|aa)+`) or can match the empty string (`(a?)+`).
+    Invalid patterns are rejected as well.
+    """
+    groups: list[_Group] = []
+    i = 0
+    n = len(pattern)
+
+    def reject(reason: str):
+        raise UnsafePatternError(f"{reason} in pattern {pattern!r} (backtracking-prone)")
+
+    while i < n:
+        ch = pattern[i]
+        group = None
+
+        if ch == "\\":
+            # Zero-width assertions match the empty string
+            atom_nullable = pattern[i + 1:i + 2] in ("b", "B", "A", "Z")
+            i += 2
+        elif ch == "[":
+            # Skip the character class, `]` right after `[` or `[^` is literal
+            j = i + 1
+            if j < n and pattern[j] == "^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 2 if pattern[j] == "\\" else 1
+            atom_nullable = False
+            i = j + 1
+        elif ch == "(":
+            # Keep group syntax like (?: (?! (?<= together, it is not a quantifier
+            m = re.match(r"\(\?(?:[:=!>]|<[=!]|P?<\w+>|[aiLmsux-]+[:)])?", pattern[i:])
+            length = m.end() if m else 1
+            prefix = pattern[i:i + length]
+            # Inline flags like (?i) are complete, they open no group
+            if not prefix.endswith(")"):
+                groups.append(_Group(lookaround=prefix in ("(?=", "(?!", "(?<=", "(?<!")))
+            i += length
+            continue
+        elif ch == "|":
+            if groups:
+                groups[-1].alternation = True
+                groups[-1].end_branch()
+            i += 1
+            continue
+        elif ch == ")":
+            group = groups.pop() if groups else _Group(lookaround=False)
+            group.end_branch()
+            atom_nullable = group.nullable or group.lookaround
+            i += 1
+        else:
+            atom_nullable = ch in "^$"
+            i += 1
+
+        q = _quantifier_at(pattern, i)
+        repeating = bool(q) and _is_repeating(q[0])
+        if group is not None and repeating:
+            if group.repeats:
+                reject("Nested quantifier")
+            if group.alternation:
+                reject("Quantified alternation")
+            if atom_nullable:
+                reject("Quantified empty-matchable group")
+        if q:
+            quantifier, _, i = q
+            atom_nullable = atom_nullable or _is_optional(quantifier)
+
+        if groups:
+            parent = groups[-1]
+            if repeating or (group is not None and group.repeats):
+                parent.repeats = True
+            parent.branch_nullable = parent.branch_nullable and atom_nullable
+
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise UnsafePatternError(f"Invalid pattern {pattern!r}: {e}") from e
+
+
+def required_literal(pattern: str, min_length: int = 3) -> str | None:
+    """
+    Lowercased literal that every (case-insensitive) match must contain.
+
+    Used as a cheap substring prefilter before running the regex. Reads the
+    leading literal run of the pattern; case classes like `[Ss]` count as one
+    letter. Returns None for top-level alternations or short literals.
+    """
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "[":
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return None
+        i += 1
+
+    literal: list[str] = []
+    i = 0
+    while pattern.startswith("\\b", i):
+        i += 2
+    while i < len(pattern):
+        ch = pattern[i]
+        case_class = re.match(r"\[(\w)(\w)\]", pattern[i:])
+        if case_class and case_class.group(1).lower() == case_class.group(2).lower():
+            letter, length = case_class.group(1).lower(), case_class.end()
+        elif ch == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            letter, length = pattern[i + 1], 2
+        elif ch not in ".^$*+?{}()|[]\\":
+            letter, length = ch.lower(), 1
+        else:
+            break
+        q = _quantifier_at(pattern, i + length)
+        if q and q[0] != "+":
+            # Optional or repeated atom: not a fixed part of the literal
+            break
+        literal.append(letter)
+        i += length
+        if q:
+            break
+
+    text = "".join(literal)
+    return text if len(text) >= min_length else None
+
+
+class Budget:
+    """Time budget and flags for matching a single question."""
+
+    def __init__(self, guard: "MatchGuard"):
+        self.guard = guard
+        self.deadline = time.perf_counter() + guard.budget_s
+        self.flags: list[str] = []
+
+    def expired(self) -> bool:
+        return time.perf_counter() > self.deadline
+
+    def prepare(self, text: str) -> str:
+        """Cut overlong text before matching and flag the question."""
+        if len(text) <= self.guard.max_chars:
+            return text
+        self.flag(FLAG_TEXT_TRUNCATED)
+        self.guard.stats["truncated"] += 1
+        return text[:self.guard.max_chars]
+
+    def fallback(self, kind: str) -> None:
+        """Record that the default rule/tag was used because time ran out."""
+        self.flag(FLAG_BUDGET_EXCEEDED)
+        self.guard.stats[f"{kind}_fallback"] += 1
+
+    def flag(self, name: str) -> None:
+        if name not in self.flags:
+            self.flags.append(name)
+
+
+class MatchGuard:
+    """Compiles keyword tables safely and hands out per-question budgets."""
+
+    def __init__(self, budget_s: float = DEFAULT_BUDGET_S,
+                 max_chars: int = DEFAULT_MAX_CHARS):
+        self.budget_s = budget_s
+        self.max_chars = max_chars
+        self.stats: Counter[str] = Counter()
+
+    def compile(self, pattern: str, flags: int = 0) -> re.Pattern:
+        try:
+            check_pattern(pattern)
+        except UnsafePatternError:
+            self.stats["rejected_patterns"] += 1
+            raise
+        return re.compile(pattern, flags)
+
+    def start(self) -> Budget:
+        self.stats["questions"] += 1
+        return Budget(self)
+
+    def summary(self) -> str:
+        keys = ("questions", "truncated",
+                "rule_fallback", "tag_fallback")
+        return ", ".join(f"{k}={self.stats.get(k, 0)}" for k in keys)
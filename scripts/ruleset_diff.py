@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Compare two versions of the keyword tables (RULE_KEYWORDS, TAG_KEYWORDS) over
+the question corpus.
+
+Both versions are evaluated in one parallel pass: the union of their patterns
+is compiled once and each distinct pattern is scanned once per question; the
+rule scores and tag sets of both versions are derived from that shared scan.
+Patterns whose required literal does not occur in the lowercased text are
+skipped without running the regex.
+Ranking and formatting use rank_rules() from the current enrich-questions.py,
+so only the keyword tables are compared.
+
+Reports every question whose primary rule, secondary rules or tag set
+changed, plus churn per rule and per tag.
+
+Usage:
+    python scripts/ruleset_diff.py                              # HEAD vs working tree
+    python scripts/ruleset_diff.py --old origin/main --new HEAD
+    python scripts/ruleset_diff.py --old /tmp/enrich-old.py --input data/questions-all.json
+    python scripts/ruleset_diff.py --json diff-report.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import time
+import types
+from collections import Counter
+from multiprocessing import Pool
+from pathlib import Path
+
+from enrich_loader import ENRICH_PATH, load_enrich
+from regex_guard import MatchGuard, required_literal
+
+ROOT = ENRICH_PATH.parents[1]
+DEFAULT_INPUT = ROOT / "data" / "questions-all.json"
+
+# Below this corpus size a process pool costs more than it saves
+MIN_PARALLEL = 2000
+
+
+def load_ruleset(spec: str | None, name: str) -> types.ModuleType:
+    """
+    Load enrich-questions.py from a file path or a git revision.
+
+    spec None means the working tree version.
+    """
+    if spec is None:
+        return load_enrich(name)
+    if Path(spec).is_file():
+        path = Path(spec)
+        source = path.read_text(encoding="utf-8")
+    else:
+        rel = ENRICH_PATH.relative_to(ROOT).as_posix()
+        try:
+            source = subprocess.run(
+                ["git", "show", f"{spec}:{rel}"], cwd=ROOT,
+                capture_output=True, text=True, check=True,
+            ).stdout
+        except subprocess.CalledProcessError as e:
+            raise SystemExit(f"ERROR: cannot read {rel} at '{spec}': {e.stderr.strip()}")
+        path = Path(f"{spec}:{rel}")
+
+    return load_enrich(name, source, str(path))
+
+
+def build_plan(rulesets: list[types.ModuleType]) -> dict:
+    """
+    Deduplicate patterns across rulesets.
+
+    Returns plain data (picklable for worker processes): the pattern list,
+    which patterns need match counts (rule patterns) and, per version, the
+    rule table as (pattern id, rule, weight) and the tag table as
+    {tag: [pattern id, ...]}.
+    """
+    pattern_ids: dict[str, int] = {}
+    counted: set[int] = set()
+
+    def pid(pattern: str) -> int:
+        return pattern_ids.setdefault(pattern, len(pattern_ids))
+
+    versions = []
+    for rs in rulesets:
+        rules = [(pid(p), rule_num, weight) for p, rule_num, weight in rs.RULE_KEYWORDS]
+        counted.update(p for p, _, _ in rules)
+        tags = {tag: [pid(p) for p in patterns] for tag, patterns in rs.TAG_KEYWORDS.items()}
+        versions.append({"rules": rules, "tags": tags})
+
+    return {
+        "patterns": list(pattern_ids),
+        "counted": sorted(counted),
+        "versions": versions,
+    }
+
+
+_worker: dict = {}
+
+
+def _init_worker(plan: dict) -> None:
+    guard = MatchGuard()
+    _worker["plan"] = plan
+    _worker["compiled"] = [guard.compile(p, re.IGNORECASE) for p in plan["patterns"]]
+    _worker["literals"] = [required_literal(p) for p in plan["patterns"]]
+    _worker["counted"] = set(plan["counted"])
+    _worker["enrich"] = load_enrich("enrich_current")
+
+
+def _evaluate(question: dict) -> list[tuple[list[int], list[str]]]:
+    """Shared scan of one question, then (rules, tags) per version."""
+    compiled = _worker["compiled"]
+    literals = _worker["literals"]
+    counted = _worker["counted"]
+    rank_rules = _worker["enrich"].rank_rules
+    text = question.get("situation", "") + " " + question.get("correctAnswer", "")
+    lowered = text.lower()
+
+    # One pass over all distinct patterns, shared by both versions
+    hits = [0] * len(compiled)
+    for pid, literal in enumerate(literals):
+        if literal is not None and literal not in lowered:
+            continue
+        if pid in counted:
+            hits[pid] = sum(1 for _ in compiled[pid].finditer(text))
+        elif compiled[pid].search(text):
+            hits[pid] = 1
+
+    results = []
+    for version in _worker["plan"]["versions"]:
+        scores: dict[int, int] = {}
+        for pid, rule_num, weight in version["rules"]:
+            count = hits[pid]
+            if count:
+                scores[rule_num] = scores.get(rule_num, 0) + weight * count
+        tags = sorted(
+            tag for tag, pids in version["tags"].items()
+            if any(hits[pid] for pid in pids)
+        ) or ["Allgemein"]
+        results.append((rank_rules(scores), tags))
+    return results
+
+
+def _evaluate_chunk(questions: list[dict]) -> list[tuple[int, list]]:
+    return [(q["index"], _evaluate(q)) for q in questions]
+
+
+def diff_corpus(questions: list[dict], plan: dict, workers: int) -> list[tuple[int, list]]:
+    """Evaluate both versions for every question, in parallel for large corpora."""
+    if workers <= 1 or len(questions) < MIN_PARALLEL:
+        _init_worker(plan)
+        return _evaluate_chunk(questions)
+
+    chunk = max(1, len(questions) // (workers * 4))
+    chunks = [questions[i:i + chunk] for i in range(0, len(questions), chunk)]
+    with Pool(workers, initializer=_init_worker, initargs=(plan,)) as pool:
+        results = []
+        for part in pool.imap(_evaluate_chunk, chunks):
+            results.extend(part)
+    return results
+
+
+def summarize(results: list[tuple[int, list]]) -> dict:
+    """Collect changed questions and per-rule / per-tag churn."""
+    changes = []
+    primary_churn: dict[int, Counter] = {}
+    secondary_churn: dict[int, Counter] = {}
+    tag_churn: dict[str, Counter] = {}
+
+    for index, ((old_rules, old_tags), (new_rules, new_tags)) in results:
+        old_primary, new_primary = old_rules[0], new_rules[0]
+        old_secondary, new_secondary = set(old_rules[1:]), set(new_rules[1:])
+        added_tags = sorted(set(new_tags) - set(old_tags))
+        removed_tags = sorted(set(old_tags) - set(new_tags))
+
+        if old_primary == new_primary and old_secondary == new_secondary and not added_tags and not removed_tags:
+            continue
+
+        if old_primary != new_primary:
+            primary_churn.setdefault(old_primary, Counter())["lost"] += 1
+            primary_churn.setdefault(new_primary, Counter())["gained"] += 1
+        for rule_num in new_secondary - old_secondary:
+            secondary_churn.setdefault(rule_num, Counter())["gained"] += 1
+        for rule_num in old_secondary - new_secondary:
+            secondary_churn.setdefault(rule_num, Counter())["lost"] += 1
+        for tag in added_tags:
+            tag_churn.setdefault(tag, Counter())["gained"] += 1
+        for tag in removed_tags:
+            tag_churn.setdefault(tag, Counter())["lost"] += 1
+
+        changes.append({
+            "index": index,
+            "primaryRule": [old_primary, new_primary],
+            "secondaryRules": [old_rules[1:], new_rules[1:]],
+            "tagsAdded": added_tags,
+            "tagsRemoved": removed_tags,
+        })
+
+    return {
+        "questions": len(results),
+        "changed": len(changes),
+        "changes": changes,
+        "primaryRuleChurn": {str(k): dict(v) for k, v in sorted(primary_churn.items())},
+        "secondaryRuleChurn": {str(k): dict(v) for k, v in sorted(secondary_churn.items())},
+        "tagChurn": {k: dict(v) for k, v in sorted(tag_churn.items())},
+    }
+
+
+def print_report(report: dict, limit: int) -> None:
+    print(f"Changed: {report['changed']}/{report['questions']} questions")
+
+    if report["changes"]:
+        print("\nQuestions:")
+        for c in report["changes"][:limit]:
+            parts = []
+            old_p, new_p = c["primaryRule"]
+            if old_p != new_p:
+                parts.append(f"primary Regel {old_p} → Regel {new_p}")
+            old_s, new_s = c["secondaryRules"]
+            if set(old_s) != set(new_s):
+                parts.append(f"secondary {old_s} → {new_s}")
+            if c["tagsAdded"]:
+                parts.append("+" + ", +".join(c["tagsAdded"]))
+            if c["tagsRemoved"]:
+                parts.append("-" + ", -".join(c["tagsRemoved"]))
+            print(f"  #{c['index']:<6} {'; '.join(parts)}")
+        if len(report["changes"]) > limit:
+            print(f"  ... {len(report['changes']) - limit} more (use --json for the full list)")
+
+    for title, churn, label in (
+        ("Primary rule churn", report["primaryRuleChurn"], "Regel "),
+        ("Secondary rule churn", report["secondaryRuleChurn"], "Regel "),
+        ("Tag churn", report["tagChurn"], ""),
+    ):
+        if churn:
+            print(f"\n{title}:")
+            for key, counts in churn.items():
+                print(f"  {label}{key}: +{counts.get('gained', 0)} / -{counts.get('lost', 0)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two keyword ruleset versions over the corpus")
+    parser.add_argument("--old", default="HEAD", help="Old ruleset: git revision or path to enrich-questions.py (default: HEAD)")
+    parser.add_argument("--new", help="New ruleset: git revision or path (default: working tree)")
+    parser.add_argument("--input", default=str(DEFAULT_INPUT), help="Questions JSON")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--limit", type=int, default=50, help="Max changed questions to print")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+
+    old = load_ruleset(args.old, "ruleset_old")
+    new = load_ruleset(args.new, "ruleset_new")
+    plan = build_plan([old, new])
+
+    start = time.perf_counter()
+    results = diff_corpus(questions, plan, args.workers)
+    report = summarize(results)
+    elapsed = time.perf_counter() - start
+
+    print(f"Ruleset diff: {old.__file__} → {new.__file__}")
+    print(f"  {len(plan['patterns'])} distinct patterns, {len(questions)} questions, {elapsed:.2f}s\n")
+    print_report(report, args.limit)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nReport saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
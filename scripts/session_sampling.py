@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Precomputed stratified sampling tables for Regeltest sessions.
+
+Runs after enrich-questions.py. Builds, per stratification dimension (rule
+number and tag), a flat question order grouped by key and sorted by
+schwierigkeitsgrad, cumulative offsets per (key, difficulty) and an alias
+table over keys for every difficulty range. Drawing a session of k questions
+is then O(k), independent of corpus size.
+
+Usage:
+    python scripts/session_sampling.py                       # build + export
+    python scripts/session_sampling.py --sample 20 --difficulty 2-3
+    python scripts/session_sampling.py --sample 10 --tags Abseits Handspiel
+
+Library:
+    tables = build_tables(questions)
+    session = sample_session(tables, 20, difficulty=(2, 3))
+"""
+
+import argparse
+import json
+import random
+import re
+from pathlib import Path
+
+from enrich_loader import load_enrich
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_INPUT = ROOT / "data" / "evaluation" / "questions-enriched.json"
+DEFAULT_OUTPUT = ROOT / "data" / "evaluation" / "sampling-tables.json"
+
+# schwierigkeitsgrad scale
+LEVELS = (1, 2, 3, 4, 5)
+
+TABLES_VERSION = 1
+
+
+def primary_rule(q: dict, enrich=None) -> int | None:
+    """Primary rule number from ruleReference, classified on the fly if empty."""
+    ref = q.get("ruleReference", "")
+    if not ref and enrich is not None:
+        ref = enrich.get_rule_references(q.get("situation", ""), q.get("correctAnswer", ""))
+    m = re.search(r"Regel (\d+)", ref)
+    return int(m.group(1)) if m else None
+
+
+def _difficulty(q: dict) -> int:
+    """schwierigkeitsgrad clamped to LEVELS; missing or non-numeric → lowest level."""
+    try:
+        level = int(q.get("schwierigkeitsgrad") or LEVELS[0])
+    except (TypeError, ValueError):
+        level = LEVELS[0]
+    return min(max(level, LEVELS[0]), LEVELS[-1])
+
+
+def _build_alias(weights: list[int]) -> tuple[list[float], list[int]]:
+    """Vose's alias method: O(n) build, O(1) draw."""
+    n = len(weights)
+    total = sum(weights)
+    prob = [0.0] * n
+    alias = [0] * n
+    if total == 0:
+        return prob, alias
+
+    scaled = [w * n / total for w in weights]
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = scaled[l] + scaled[s] - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+
+    for i in large + small:
+        prob[i] = 1.0
+    return prob, alias
+
+
+def _build_dimension(groups: dict, difficulty_of: dict[int, int]) -> dict:
+    """
+    Flatten {key: [question index, ...]} into one order array.
+
+    offsets[key][j] is the start of difficulty LEVELS[j] within the key's
+    block; offsets[key][-1] is the end. A difficulty range is therefore one
+    contiguous slice.
+    """
+    keys = sorted(groups, key=str)
+    order: list[int] = []
+    offsets: dict[str, list[int]] = {}
+
+    for key in keys:
+        members = sorted(groups[key], key=lambda idx: (difficulty_of[idx], idx))
+        bounds = []
+        pos = 0
+        for level in LEVELS:
+            while pos < len(members) and difficulty_of[members[pos]] < level:
+                pos += 1
+            bounds.append(len(order) + pos)
+        bounds.append(len(order) + len(members))
+        offsets[str(key)] = bounds
+        order.extend(members)
+
+    alias: dict[str, dict] = {}
+    for lo in range(len(LEVELS)):
+        for hi in range(lo, len(LEVELS)):
+            weights = [offsets[str(k)][hi + 1] - offsets[str(k)][lo] for k in keys]
+            prob, alias_idx = _build_alias(weights)
+            alias[f"{LEVELS[lo]}-{LEVELS[hi]}"] = {"prob": prob, "alias": alias_idx}
+
+    return {"keys": [str(k) for k in keys], "order": order, "offsets": offsets, "alias": alias}
+
+
+def build_tables(questions: list[dict], enrich=None) -> dict:
+    """Build rule and tag sampling tables from enriched questions."""
+    difficulty_of: dict[int, int] = {}
+    by_rule: dict[int, list[int]] = {}
+    by_tag: dict[str, list[int]] = {}
+
+    for q in questions:
+        idx = q["index"]
+        difficulty_of[idx] = _difficulty(q)
+        rule = primary_rule(q, enrich)
+        if rule is not None:
+            by_rule.setdefault(rule, []).append(idx)
+        for tag in q.get("tags", []):
+            by_tag.setdefault(tag, []).append(idx)
+
+    return {
+        "version": TABLES_VERSION,
+        "levels": list(LEVELS),
+        "questionCount": len(questions),
+        "rule": _build_dimension(by_rule, difficulty_of),
+        "tag": _build_dimension(by_tag, difficulty_of),
+    }
+
+
+class _SliceDraw:
+    """
+    Draw without replacement from order[start:end] in O(1) per draw.
+
+    Virtual Fisher-Yates shuffle: swaps are recorded in a dict instead of
+    mutating the shared order array.
+    """
+
+    def __init__(self, order: list[int], start: int, end: int):
+        self.order = order
+        self.start = start
+        self.remaining = end - start
+        self.swaps: dict[int, int] = {}
+
+    def draw(self, rng: random.Random) -> int | None:
+        if self.remaining <= 0:
+            return None
+        i = rng.randrange(self.remaining)
+        last = self.remaining - 1
+        picked = self.swaps.get(i, i)
+        self.swaps[i] = self.swaps.get(last, last)
+        self.remaining -= 1
+        return self.order[self.start + picked]
+
+
+def sample_session(
+    tables: dict,
+    k: int,
+    difficulty: tuple[int, int] | None = None,
+    rules: list[int] | None = None,
+    tags: list[str] | None = None,
+    rng: random.Random | None = None,
+) -> list[int]:
+    """
+    Draw k distinct question indices.
+
+    Every requested rule (or tag, if tags are given) is covered once first,
+    as far as k and the difficulty range allow; the remaining slots are filled
+    proportionally via the alias table. Default coverage is all rules.
+    """
+    rng = rng or random.Random()
+    levels = tables["levels"]
+    lo, hi = sorted(difficulty or (levels[0], levels[-1]))
+    lo_pos = levels.index(min(max(lo, levels[0]), levels[-1]))
+    hi_pos = levels.index(min(max(hi, levels[0]), levels[-1]))
+
+    if tags:
+        dim, cover = tables["tag"], [str(t) for t in tags]
+    else:
+        dim = tables["rule"]
+        cover = [str(r) for r in rules] if rules else list(dim["keys"])
+    cover = [key for key in cover if key in dim["offsets"]]
+
+    slices: dict[str, _SliceDraw] = {}
+
+    def slice_for(key: str) -> _SliceDraw:
+        if key not in slices:
+            bounds = dim["offsets"][key]
+            slices[key] = _SliceDraw(dim["order"], bounds[lo_pos], bounds[hi_pos + 1])
+        return slices[key]
+
+    session: list[int] = []
+    taken: set[int] = set()
+
+    def take(key: str) -> bool:
+        # Tag blocks overlap (a question has several tags), skip duplicates
+        s = slice_for(key)
+        while (idx := s.draw(rng)) is not None:
+            if idx not in taken:
+                taken.add(idx)
+                session.append(idx)
+                return True
+        return False
+
+    # 1. Coverage: one question per requested key
+    rng.shuffle(cover)
+    for key in cover:
+        if len(session) >= k:
+            break
+        take(key)
+
+    # 2. Fill: pick keys proportional to their available questions
+    restrict = set(cover) if (rules or tags) else None
+    table = dim["alias"][f"{levels[lo_pos]}-{levels[hi_pos]}"]
+    prob, alias = table["prob"], table["alias"]
+    keys = dim["keys"]
+    attempts = 0
+    while len(session) < k and keys and attempts < 20 * k:
+        attempts += 1
+        i = rng.randrange(len(keys))
+        key = keys[i] if rng.random() < prob[i] else keys[alias[i]]
+        if restrict is not None and key not in restrict:
+            continue
+        take(key)
+
+    # Exhausted strata can starve the alias draw; finish with a linear sweep
+    if len(session) < k:
+        for key in cover if restrict is not None else keys:
+            while len(session) < k and take(key):
+                pass
+
+    rng.shuffle(session)
+    return session
+
+
+def load_tables(path: Path = DEFAULT_OUTPUT) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _parse_range(value: str) -> tuple[int, int]:
+    lo, _, hi = value.partition("-")
+    try:
+        bounds = sorted((int(lo), int(hi or lo)))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid difficulty range '{value}' (expected e.g. 2-3)")
+    if bounds[0] < LEVELS[0] or bounds[1] > LEVELS[-1]:
+        raise argparse.ArgumentTypeError(f"difficulty must be within {LEVELS[0]}-{LEVELS[-1]}")
+    return bounds[0], bounds[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build stratified sampling tables for Regeltest sessions")
+    parser.add_argument("--input", default=str(DEFAULT_INPUT), help="Enriched questions JSON")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="Exported sampling tables JSON")
+    parser.add_argument("--sample", type=int, help="Draw a sample session of this size after building")
+    parser.add_argument("--difficulty", type=_parse_range, help="Difficulty range, e.g. 2-3")
+    parser.add_argument("--rules", type=int, nargs="+", help="Rules to cover (default: all)")
+    parser.add_argument("--tags", nargs="+", help="Cover tags instead of rules")
+    parser.add_argument("--seed", type=int, help="Random seed for --sample")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+
+    enrich = load_enrich()
+    tables = build_tables(questions, enrich=enrich)
+
+    output = json.dumps(tables, ensure_ascii=False, separators=(",", ":"))
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(output + "\n")
+
+    print(f"Sampling tables for {len(questions)} questions → {args.output}")
+    print(f"  Rules: {len(tables['rule']['keys'])}, Tags: {len(tables['tag']['keys'])}")
+
+    if args.sample:
+        rng = random.Random(args.seed)
+        session = sample_session(tables, args.sample, args.difficulty, args.rules, args.tags, rng)
+        by_index = {q["index"]: q for q in questions}
+        print(f"\nSample session ({len(session)} questions):")
+        for idx in session:
+            q = by_index[idx]
+            print(f"  #{idx:<5} Regel {primary_rule(q, enrich) or '?':<3} Schwierigkeit {q.get('schwierigkeitsgrad', '?')}")
+
+
+if __name__ == "__main__":
+    main()
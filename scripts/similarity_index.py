@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Offline TF-IDF similarity index over situation + correctAnswer.
+
+Used for "similar situations" after a wrong answer and for pulling
+explanation text from related questions, without scanning the corpus per
+request.
+
+Tokenization follows the keyword tables in enrich-questions.py: matching is
+case-insensitive and prefix-based (`\\b[Aa]uswechsl` matches Auswechslung,
+Auswechslungen, ...), so tokens are lowercased and common German inflection
+suffixes are stripped. Single-word synonyms from data/evaluation/synonyms.json
+(Elfmeter → Strafstoß, Eckball → Eckstoß, ...) map to one canonical term.
+Compound spellings with `/` or `-` (Gelb/Rot, Gelb-Rot, SR-Ball) are joined
+into one token before splitting, otherwise `\w+` would split them apart.
+
+Posting lists are impact-ordered (highest weight first), so query() only
+walks the first MAX_POSTINGS entries of each term and common terms cost no
+more than rare ones. related() is static: the NEIGHBOURS most similar
+questions per document are computed at build time (candidates from the
+document's strongest terms, rescored exactly) and read back in O(k).
+
+File layout (little-endian, sections 4-byte aligned, read via mmap):
+    header      magic, n_docs, n_terms, n_postings, n_forward, n_neighbours
+    doc_ids     uint32[n_docs]       question index, sorted
+    term_offs   uint32[n_terms + 1]  offsets into term_blob
+    term_blob   utf-8 terms, sorted bytewise (binary search)
+    idf         float32[n_terms]
+    post_offs   uint32[n_terms + 1]  posting list bounds per term
+    post_docs   uint32[n_postings]   doc ordinal, by descending weight
+    post_wts    float32[n_postings]  normalised tf-idf weight
+    fwd_offs    uint32[n_docs + 1]   forward list bounds per doc
+    fwd_terms   uint32[n_forward]    term ordinal
+    fwd_wts     float32[n_forward]   normalised tf-idf weight
+    nbr_docs    uint32[n_docs * n_neighbours]   doc ordinal, NO_DOC = unused
+    nbr_scores  float32[n_docs * n_neighbours]  cosine score, descending
+
+Usage:
+    python scripts/similarity_index.py                    # build index
+    python scripts/similarity_index.py --related 12       # top-k for question 12
+    python scripts/similarity_index.py --query "Torwart nimmt Rückpass auf"
+"""
+
+import argparse
+import heapq
+import json
+import math
+import mmap
+import re
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_INPUT = ROOT / "data" / "questions-all.json"
+DEFAULT_OUTPUT = ROOT / "data" / "similarity-index.bin"
+SYNONYMS_PATH = ROOT / "data" / "evaluation" / "synonyms.json"
+
+MAGIC = b"SRSIM002"
+HEADER = struct.Struct("<8sIIIII")
+
+# Precomputed neighbours per document for related()
+NEIGHBOURS = 10
+# Postings walked per query term (the highest-weighted ones)
+MAX_POSTINGS = 200
+# Neighbour candidates at build time: the document's strongest terms and
+# the top postings of each; the best candidates are rescored exactly
+NEIGHBOUR_TERMS = 24
+NEIGHBOUR_POSTINGS = 100
+NEIGHBOUR_RESCORE = 6 * NEIGHBOURS
+NO_DOC = 0xFFFFFFFF
+
+STOPWORDS = frozenset("""
+    aber als am an auch auf aus bei bis da dann das dass dem den der des die
+    diese dieser dieses doch du durch ein eine einem einen einer eines er es
+    für hat hatte ich ihm ihn ihr im in ist ja kann mit nach nein nicht noch
+    nun nur ob oder sein seine seinem seinen seiner sich sie sind so um und
+    uns vom von vor war was wenn wer wie wird wo zu zum zur über
+""".split())
+
+# Longest first, so "en" is stripped before "n"
+SUFFIXES = ("ungen", "ung", "en", "er", "es", "em", "e", "n", "s")
+MIN_STEM = 4
+
+TOKEN_RE = re.compile(r"\w+")
+COMPOUND_SEP_RE = re.compile(r"[/-]")
+
+
+def _stem(token: str) -> str:
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def _load_synonyms(path: Path = SYNONYMS_PATH) -> tuple[dict[str, str], dict[str, str]]:
+    """
+    Single-word synonyms from synonyms.json.
+
+    Returns (stems, compounds): synonym stem → stem of the canonical term,
+    and lowercased compound spelling ("gelb-rot") → joined canonical
+    token ("gelbrot"). Multi-word entries are skipped.
+    """
+    if not path.exists():
+        return {}, {}
+    with open(path, "r", encoding="utf-8") as f:
+        groups = json.load(f)
+    mapping, compounds = {}, {}
+    for canonical, variants in groups.items():
+        canon = canonical.lower()
+        if " " in canon or canon in STOPWORDS:
+            continue
+        joined = COMPOUND_SEP_RE.sub("", canon)
+        for variant in [canonical, *variants]:
+            v = variant.lower()
+            if " " in v or v in STOPWORDS:
+                continue
+            if COMPOUND_SEP_RE.search(v):
+                compounds[v] = joined
+            elif v != joined:
+                mapping[_stem(v)] = _stem(joined)
+    return mapping, compounds
+
+
+SYNONYMS, COMPOUNDS = _load_synonyms()
+# Longest spelling first, and only as a whole word ("gelb-rot" not in "gelb-rote")
+COMPOUND_RE = re.compile(
+    r"(?<!\w)(?:" + "|".join(map(re.escape, sorted(COMPOUNDS, key=len, reverse=True))) + r")(?!\w)"
+) if COMPOUNDS else None
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, drop stop words and digits, stem, canonicalise synonyms."""
+    text = text.lower()
+    if COMPOUND_RE is not None:
+        text = COMPOUND_RE.sub(lambda m: COMPOUNDS[m.group(0)], text)
+    tokens = []
+    for raw in TOKEN_RE.findall(text):
+        if raw in STOPWORDS or raw.isdigit() or len(raw) < 2:
+            continue
+        stem = _stem(raw)
+        tokens.append(SYNONYMS.get(stem, stem))
+    return tokens
+
+
+def tf_weights(tokens: list[str]) -> dict[str, float]:
+    counts: dict[str, int] = {}
+    for t in tokens:
+        counts[t] = counts.get(t, 0) + 1
+    return {t: 1.0 + math.log(c) for t, c in counts.items()}
+
+
+def le_bytes(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _neighbours(d: int, vec: dict[int, float], vectors: list[dict[int, float]],
+                postings: list[list[tuple[int, float]]]) -> list[tuple[int, float]]:
+    """Top NEIGHBOURS (doc ordinal, cosine) for document d."""
+    partial: dict[int, float] = {}
+    strongest = heapq.nlargest(NEIGHBOUR_TERMS, vec.items(), key=lambda item: item[1])
+    for tid, w in strongest:
+        for other, ow in postings[tid][:NEIGHBOUR_POSTINGS]:
+            partial[other] = partial.get(other, 0.0) + w * ow
+    partial.pop(d, None)
+
+    candidates = heapq.nlargest(NEIGHBOUR_RESCORE, partial, key=partial.__getitem__)
+    scored = []
+    for other in candidates:
+        score = sum(w * vec.get(tid, 0.0) for tid, w in vectors[other].items())
+        scored.append((other, score))
+    return heapq.nlargest(NEIGHBOURS, scored, key=lambda item: (item[1], -item[0]))
+
+
+def build_index(questions: list[dict], output_path: Path) -> dict:
+    """Build the index file; returns basic stats."""
+    docs = sorted(questions, key=lambda q: q["index"])
+    doc_tfs = [
+        tf_weights(tokenize(q.get("situation", "") + " " + q.get("correctAnswer", "")))
+        for q in docs
+    ]
+
+    df: dict[str, int] = {}
+    for tfs in doc_tfs:
+        for t in tfs:
+            df[t] = df.get(t, 0) + 1
+
+    n_docs = len(docs)
+    terms = sorted(df, key=lambda t: t.encode("utf-8"))
+    term_id = {t: i for i, t in enumerate(terms)}
+    idf = [math.log((1 + n_docs) / (1 + df[t])) + 1.0 for t in terms]
+
+    # Normalised document vectors
+    postings: list[list[tuple[int, float]]] = [[] for _ in terms]
+    vectors: list[dict[int, float]] = []
+    fwd_offs = array("I", [0])
+    fwd_terms = array("I")
+    fwd_wts = array("f")
+    for d, tfs in enumerate(doc_tfs):
+        vec = {term_id[t]: w * idf[term_id[t]] for t, w in tfs.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        vec = {tid: vec[tid] / norm for tid in sorted(vec)}
+        vectors.append(vec)
+        for tid, w in vec.items():
+            postings[tid].append((d, w))
+            fwd_terms.append(tid)
+            fwd_wts.append(w)
+        fwd_offs.append(len(fwd_terms))
+
+    # Impact order: highest weight first, ties by doc ordinal
+    for plist in postings:
+        plist.sort(key=lambda item: (-item[1], item[0]))
+
+    nbr_docs = array("I")
+    nbr_scores = array("f")
+    for d, vec in enumerate(vectors):
+        neighbours = _neighbours(d, vec, vectors, postings)
+        neighbours += [(NO_DOC, 0.0)] * (NEIGHBOURS - len(neighbours))
+        for other, score in neighbours:
+            nbr_docs.append(other)
+            nbr_scores.append(score)
+
+    term_offs = array("I", [0])
+    blob = bytearray()
+    for t in terms:
+        blob += t.encode("utf-8")
+        term_offs.append(len(blob))
+    blob += b"\0" * (-len(blob) % 4)
+
+    post_offs = array("I", [0])
+    post_docs = array("I")
+    post_wts = array("f")
+    for plist in postings:
+        for d, w in plist:
+            post_docs.append(d)
+            post_wts.append(w)
+        post_offs.append(len(post_docs))
+
+    sections = [
+        array("I", (q["index"] for q in docs)),
+        term_offs,
+        bytes(blob),
+        array("f", idf),
+        post_offs,
+        post_docs,
+        post_wts,
+        fwd_offs,
+        fwd_terms,
+        fwd_wts,
+        nbr_docs,
+        nbr_scores,
+    ]
+    with open(output_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, n_docs, len(terms), len(post_docs), len(fwd_terms), NEIGHBOURS))
+        for section in sections:
+            f.write(section if isinstance(section, bytes) else le_bytes(section))
+
+    return {"docs": n_docs, "terms": len(terms), "postings": len(post_docs),
+            "bytes": output_path.stat().st_size}
+
+
+class MappedIndex:
+    """
+    Read-only, memory-mapped index file (shared with regelheft_index.py).
+
+    Checks the header, hands out the 4-byte aligned sections in file order
+    and looks terms up by binary search in the sorted term table
+    (subclasses set term_offs, term_blob and n_terms).
+    """
+
+    def __init__(self, path: Path, magic: bytes, header: struct.Struct, kind: str):
+        if sys.byteorder != "little":
+            raise RuntimeError(f"{type(self).__name__} requires a little-endian platform")
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        found, *self.header = header.unpack_from(self._mm, 0)
+        if found != magic:
+            self._mm.close()
+            self._file.close()
+            raise ValueError(f"{path}: not a {kind}")
+        self._view = memoryview(self._mm)
+        self._pos = header.size
+        self._sections: list[memoryview] = []
+
+    def _take(self, count: int, fmt: str) -> memoryview:
+        """Next section of count 4-byte values ("I" uint32, "f" float32)."""
+        section = self._view[self._pos:self._pos + 4 * count].cast(fmt)
+        self._pos += 4 * count
+        self._sections.append(section)
+        return section
+
+    def _take_blob(self, offs: memoryview) -> memoryview:
+        """Next utf-8 blob section, padded to 4 bytes; offs[-1] is its length."""
+        length = offs[-1] + (-offs[-1] % 4)
+        section = self._view[self._pos:self._pos + length]
+        self._pos += length
+        self._sections.append(section)
+        return section
+
+    def close(self) -> None:
+        for section in self._sections:
+            section.release()
+        self._view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _term(self, i: int) -> bytes:
+        return bytes(self.term_blob[self.term_offs[i]:self.term_offs[i + 1]])
+
+    def term_id(self, term: str) -> int | None:
+        """Binary search in the sorted term table."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.n_terms and self._term(lo) == key else None
+
+
+class SimilarityIndex(MappedIndex):
+    """Read-only, memory-mapped view of an index built by build_index()."""
+
+    def __init__(self, path: Path = DEFAULT_OUTPUT):
+        super().__init__(path, MAGIC, HEADER, "similarity index")
+        n_docs, n_terms, n_postings, n_forward, n_neighbours = self.header
+        self.n_docs, self.n_terms, self.n_neighbours = n_docs, n_terms, n_neighbours
+
+        self.doc_ids = self._take(n_docs, "I")
+        self.term_offs = self._take(n_terms + 1, "I")
+        self.term_blob = self._take_blob(self.term_offs)
+        self.idf = self._take(n_terms, "f")
+        self.post_offs = self._take(n_terms + 1, "I")
+        self.post_docs = self._take(n_postings, "I")
+        self.post_wts = self._take(n_postings, "f")
+        self.fwd_offs = self._take(n_docs + 1, "I")
+        self.fwd_terms = self._take(n_forward, "I")
+        self.fwd_wts = self._take(n_forward, "f")
+        self.nbr_docs = self._take(n_docs * n_neighbours, "I")
+        self.nbr_scores = self._take(n_docs * n_neighbours, "f")
+
+    def _doc_ordinal(self, question_index: int) -> int | None:
+        lo, hi = 0, self.n_docs
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.doc_ids[mid] < question_index:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.n_docs and self.doc_ids[lo] == question_index else None
+
+    def _search(self, vector: dict[int, float], k: int, exclude: int | None) -> list[tuple[int, float]]:
+        scores: dict[int, float] = {}
+        for tid, qw in vector.items():
+            start = self.post_offs[tid]
+            end = min(self.post_offs[tid + 1], start + MAX_POSTINGS)
+            for p in range(start, end):
+                d = self.post_docs[p]
+                scores[d] = scores.get(d, 0.0) + qw * self.post_wts[p]
+        if exclude is not None:
+            scores.pop(exclude, None)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.doc_ids[d], round(s, 4)) for d, s in best]
+
+    def query(self, text: str, k: int = 5) -> list[tuple[int, float]]:
+        """Top-k (question index, cosine score) for free text."""
+        vector = {}
+        for term, w in tf_weights(tokenize(text)).items():
+            tid = self.term_id(term)
+            if tid is not None:
+                vector[tid] = w * self.idf[tid]
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return self._search({tid: w / norm for tid, w in vector.items()}, k, exclude=None)
+
+    def related(self, question_index: int, k: int = 5) -> list[tuple[int, float]]:
+        """Top-k questions most similar to an indexed question (itself excluded)."""
+        d = self._doc_ordinal(question_index)
+        if d is None:
+            return []
+        if k <= self.n_neighbours:
+            results = []
+            for p in range(d * self.n_neighbours, d * self.n_neighbours + k):
+                other = self.nbr_docs[p]
+                if other == NO_DOC:
+                    break
+                results.append((self.doc_ids[other], round(self.nbr_scores[p], 4)))
+            return results
+        # More than precomputed: search with the document's forward vector
+        vector = {
+            self.fwd_terms[p]: self.fwd_wts[p]
+            for p in range(self.fwd_offs[d], self.fwd_offs[d + 1])
+        }
+        return self._search(vector, k, exclude=d)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the TF-IDF similarity index")
+    parser.add_argument("--input", default=str(DEFAULT_INPUT), help="Questions JSON")
+    parser.add_argument("--index", default=str(DEFAULT_OUTPUT), help="Index file")
+    parser.add_argument("--related", type=int, help="Show questions similar to this index")
+    parser.add_argument("--query", help="Show questions similar to free text")
+    parser.add_argument("-k", type=int, default=5, help="Number of results")
+    args = parser.parse_args()
+
+    index_path = Path(args.index)
+
+    if args.related is None and args.query is None:
+        with open(args.input, "r", encoding="utf-8") as f:
+            questions = json.load(f)
+        stats = build_index(questions, index_path)
+        print(f"Indexed {stats['docs']} questions → {index_path}")
+        print(f"  Terms: {stats['terms']}, Postings: {stats['postings']}, Size: {stats['bytes'] / 1024:.1f} KB")
+        return
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        by_index = {q["index"]: q for q in json.load(f)}
+
+    with SimilarityIndex(index_path) as index:
+        start = time.perf_counter()
+        if args.related is not None:
+            results = index.related(args.related, args.k)
+        else:
+            results = index.query(args.query, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Top {len(results)} ({elapsed_ms:.2f} ms):")
+    for idx, score in results:
+        situation = by_index.get(idx, {}).get("situation", "")
+        print(f"  #{idx:<5} {score:.3f}  {situation[:90]}")
+
+
+if __name__ == "__main__":
+    main()
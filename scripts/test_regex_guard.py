@@ -0,0 +1,87 @@
+"""
+Tests for regex_guard.py (static pattern analysis and required literals).
+
+Run: python -m pytest scripts/test_regex_guard.py
+"""
+
+import re
+
+import pytest
+
+from regex_guard import MatchGuard, UnsafePatternError, check_pattern, required_literal
+
+
+@pytest.mark.parametrize("pattern", [
+    r"[]a]+x",                          # `]` first in a class is literal
+    r"[^]a]*x",
+    r"\(a+\)+",                         # escaped parentheses are no group
+    r"\bElfmeter\w*",
+    r"(?<!Straf)raum",                  # lookbehind
+    r"Tor(?=linie)",                    # lookahead
+    r"a{2,}b",
+    r"(?:ab){2,}",
+    r"(?i)schiedsrichter.*entscheid",   # inline flags open no group
+    r"(?i:ab)+",
+    r"(?:e|en)?",                       # alternation under `?` does not repeat
+    r"(?P<n>ab)+(?P=n)",
+    r"[Ss]chiedsrichter.*entscheid",
+])
+def test_accepts(pattern):
+    check_pattern(pattern)
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(a+)+",
+    r"(a|aa)+",
+    r"(?:a|a)+$",
+    r"(a?)+",
+    r"(?:\b)*",
+    r"((ab)+)+",
+    r"(?:x(?:ab)*)+",
+    r"(a+){2,}",
+])
+def test_rejects(pattern):
+    with pytest.raises(UnsafePatternError):
+        check_pattern(pattern)
+
+
+def test_rejects_invalid():
+    with pytest.raises(UnsafePatternError):
+        check_pattern(r"(ab")
+
+
+def test_compile_keeps_gaps_unchanged():
+    guard = MatchGuard()
+    compiled = guard.compile(r"[Ss]chiedsrichter.*entscheid", re.IGNORECASE)
+    assert compiled.pattern == r"[Ss]chiedsrichter.*entscheid"
+    assert compiled.search("Der Schiedsrichter " + "x" * 500 + " entscheidet")
+
+
+def test_compile_counts_rejections():
+    guard = MatchGuard()
+    with pytest.raises(UnsafePatternError):
+        guard.compile(r"(a|aa)+")
+    assert guard.stats["rejected_patterns"] == 1
+
+
+@pytest.mark.parametrize("pattern, literal", [
+    (r"\b[Aa]bseits", "abseits"),
+    (r"[Ss]trafstoß", "strafstoß"),
+    (r"\b[Ee]lfmeter\w*", "elfmeter"),
+    (r"tritt.*gegen", "tritt"),
+    (r"Tor\.linie", "tor.linie"),
+    (r"Aus?ball", None),                # optional atom ends the literal, "au" is too short
+    (r"Abseits|Handspiel", None),       # top-level alternation
+    (r"(?:Tor|Ball)", None),
+])
+def test_required_literal(pattern, literal):
+    assert required_literal(pattern) == literal
+
+
+def test_budget_truncates_and_flags():
+    guard = MatchGuard(max_chars=10)
+    budget = guard.start()
+    assert budget.prepare("x" * 20) == "x" * 10
+    assert budget.flags == ["text_truncated"]
+    budget.fallback("tag")
+    assert budget.flags == ["text_truncated", "regex_budget_exceeded"]